@@ -77,7 +77,7 @@ class Visitor(metaclass=ABCMeta):
     def _pop_consumer(self):
         if not self._consumers:
             raise IndexError('No consumer')
-        self._consumers = self._consumers[:-1]
+        self._consumers.pop()
 
 
 class Node(metaclass=ABCMeta):
@@ -164,13 +164,7 @@ class DictNode(Node):
         return tokens
 
     def __str__(self):
-        parts = ['{']
-        for i, n in enumerate(self.kv_nodes):
-            parts.append(str(n))
-            if i < len(self.kv_nodes) - 1:
-                parts.append(',')
-        parts.append('}')
-        return ''.join(parts)
+        return '{' + ','.join(map(str, self.kv_nodes)) + '}'
 
 
 class ArrayNode(Node):
@@ -188,13 +182,7 @@ class ArrayNode(Node):
         return tokens
 
     def __str__(self):
-        parts = ['[']
-        for i, n in enumerate(self.value_nodes):
-            parts.append(str(n))
-            if i < len(self.value_nodes) - 1:
-                parts.append(',')
-        parts.append(']')
-        return ''.join(parts)
+        return '[' + ','.join(map(str, self.value_nodes)) + ']'
 
 
 class StringNode(Node):
@@ -1,7 +1,17 @@
+import json
 from typing import NamedTuple
 
 from pygments.token import _TokenType
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    try:
+        import ujson
+    except ImportError:
+        ujson = None
+
 HTTP_METHODS = ['get', 'post', 'put', 'delete', 'head']
 AUTO_SAVE_NAME = '__auto__'
 DEFAULT_SAVE_NAME = '__default__'
@@ -14,3 +24,35 @@ class AlwaysNoneNameSpace:
 
 PeekToken = NamedTuple('PeekToken', [('index', int), ('ttype', _TokenType), ('value', str)])
 NONE_NS = AlwaysNoneNameSpace()
+
+
+def json_dumps_bytes(obj) -> bytes:
+    """
+    Serialize the object into compact UTF-8 encoded JSON using the fastest encoder available.
+    Values the fast encoders cannot handle, e.g. integers beyond 64 bits, fall back to the
+    standard json module. Note that orjson writes NaN and Infinity as null while json
+    writes them as NaN and Infinity.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+    elif ujson is not None:
+        try:
+            return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False).encode('utf-8')
+        except (TypeError, OverflowError):
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def json_loads(s):
+    """
+    Deserialize a JSON document from str or bytes using the fastest decoder available
+    """
+    if orjson is not None:
+        return orjson.loads(s)
+    elif ujson is not None:
+        return ujson.loads(s)
+    else:
+        return json.loads(s)
@@ -158,10 +158,10 @@ class PeekCompleter(Completer):
 
         state_tracker = ParserStateTracker(text_before_cursor)
         try:
-            PeekParser((state_tracker,)).parse(text_before_cursor,
-                                               fail_fast_on_error_token=True,
-                                               last_stmt_only=True,
-                                               log_level='WARNING')
+            PeekParser((state_tracker,), cache_tokens=False).parse(text_before_cursor,
+                                                                   fail_fast_on_error_token=True,
+                                                                   last_stmt_only=True,
+                                                                   log_level='WARNING')
         except Exception:
             pass
 
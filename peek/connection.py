@@ -1,13 +1,15 @@
-import json
+import base64
 import logging
 import os
+import threading
+import time
+import weakref
 from abc import ABCMeta, abstractmethod
 from typing import List, Iterable
 
 from configobj import Section
-from elasticsearch import Elasticsearch, AuthenticationException
-from urllib3 import Timeout
 
+from peek.common import json_dumps_bytes, json_loads
 from peek.errors import PeekError
 
 _logger = logging.getLogger(__name__)
@@ -23,6 +25,9 @@ class NoopDeserializer:
 
 noopDeserializer = NoopDeserializer()
 
+# Seconds before the access token expires to proactively refresh it, capped at half of its lifetime
+_TOKEN_REFRESH_MARGIN = 30
+
 
 class BaseClient(metaclass=ABCMeta):
 
@@ -32,6 +37,9 @@ class BaseClient(metaclass=ABCMeta):
 
 
 class EsClient(BaseClient):
+    # Elasticsearch instances shared by clients with the same hosts and TLS settings. Weakly referenced
+    # so that a connection pool is released once no client uses it anymore.
+    _transport_cache = weakref.WeakValueDictionary()
 
     def __init__(self,
                  name=None,
@@ -47,10 +55,19 @@ class EsClient(BaseClient):
                  client_key=None,
                  api_key=None,
                  token=None,
-                 headers=None):
+                 headers=None,
+                 maxsize=25,
+                 http_compress=True):
+
+        # Deferred so that starting up without a connection does not pay for importing the client
+        from elasticsearch import Elasticsearch
+        from urllib3 import Timeout
 
         self.name = name
+        if isinstance(hosts, (list, tuple)):
+            hosts = ','.join(hosts)
         self.hosts = hosts
+        self._host_list = hosts.split(',') if hosts else None
         self.cloud_id = cloud_id
         self.auth = f'{username}:{password}' if username and password else None
         self.use_ssl = use_ssl
@@ -62,40 +79,53 @@ class EsClient(BaseClient):
         self.api_key = api_key
         self.token = token
         self.headers = dict(headers) if headers is not None else None
-        if token:
-            token_header = {'Authorization': f'Bearer {token}'}
-            if headers:
-                headers.update(token_header)
-            else:
-                headers = token_header
-
-        self.es = Elasticsearch(
-            hosts=self.hosts.split(',') if self.hosts else None,
-            cloud_id=cloud_id,
-            http_auth=self.auth,
-            use_ssl=use_ssl,
-            verify_certs=verify_certs,
-            ca_certs=ca_certs,
-            client_cert=client_cert,
-            client_key=client_key,
-            ssl_show_warn=False,
-            timeout=Timeout(connect=None, read=None),
-            api_key=api_key,
-            headers=headers,
-            ssl_assert_hostname=assert_hostname,
-        )
-
-    def perform_request(self, method, path, payload=None, deserialize_it=False, **kwargs):
+        self._display = self._build_display()
+        # Credentials are sent per request so that clients differing only by auth share one connection pool
+        self._request_headers = self._build_request_headers()
+
+        transport_key = (tuple(self._host_list) if self._host_list else None, cloud_id, use_ssl, verify_certs,
+                         assert_hostname, ca_certs, client_cert, client_key, maxsize, http_compress)
+        self.es = EsClient._transport_cache.get(transport_key)
+        if self.es is None:
+            self.es = Elasticsearch(
+                hosts=self._host_list,
+                cloud_id=cloud_id,
+                use_ssl=use_ssl,
+                verify_certs=verify_certs,
+                ca_certs=ca_certs,
+                client_cert=client_cert,
+                client_key=client_key,
+                ssl_show_warn=False,
+                timeout=Timeout(connect=None, read=None),
+                ssl_assert_hostname=assert_hostname,
+                # Default urllib3 pool size of 10 serializes concurrent requests, e.g. SAML callback and token refresh
+                maxsize=maxsize,
+                http_compress=http_compress,
+            )
+            # Avoid deserializing responses since we parse them with the main loop for syntax highlighting
+            self.es.transport.deserializer = noopDeserializer
+            EsClient._transport_cache[transport_key] = self.es
+
+    def perform_request(self, method, path, payload=None, deserialize_it=False, headers=None, **kwargs):
         _logger.debug(f'Performing request: {method!r}, {path!r}, {payload!r}')
-        deserializer = self.es.transport.deserializer
-        try:
-            if not deserialize_it:
-                # Avoid deserializing the response since we parse it with the main loop for syntax highlighting
-                self.es.transport.deserializer = noopDeserializer
-            return self.es.transport.perform_request(method, path, body=payload, **kwargs)
-        finally:
-            if not deserialize_it:
-                self.es.transport.deserializer = deserializer
+        if headers:
+            headers = {**self._request_headers, **{k.lower(): v for k, v in headers.items()}}
+        else:
+            # Copied since the transport adds its own headers to the dict it receives
+            headers = dict(self._request_headers) if self._request_headers else None
+        response = self.es.transport.perform_request(method, path, body=payload, headers=headers, **kwargs)
+        if deserialize_it and isinstance(response, (str, bytes)):
+            return json_loads(response)
+        return response
+
+    def update_token(self, token):
+        """
+        Swap the bearer token in place so that the shared connection pool and its
+        keep-alive connections are preserved across token refreshes
+        """
+        self.token = token
+        self._display = self._build_display()
+        self._request_headers = self._build_request_headers()
 
     def info(self):
         if self.api_key:
@@ -150,18 +180,30 @@ class EsClient(BaseClient):
     def __str__(self):
         if self.name:
             return f'{self.name}'
+        return self._display
 
-        hosts = []
-        if self.hosts:
-            for host in self.hosts.split(','):
-                if host.startswith('https://') or host.startswith('http://'):
-                    hosts.append(host)
-                else:
-                    hosts.append(('https://' if self.use_ssl else 'http://') + host)
+    def _build_request_headers(self):
+        # Same precedence as the Elasticsearch connection: basic auth, then API key, then token, then custom headers
+        headers = {k.lower(): v for k, v in self.headers.items()} if self.headers else {}
+        if self.token:
+            headers['authorization'] = f'Bearer {self.token}'
+        if self.api_key:
+            api_key = self.api_key
+            if isinstance(api_key, (list, tuple)):
+                api_key = base64.b64encode(':'.join(api_key).encode('utf-8')).decode('ascii')
+            headers['authorization'] = f'ApiKey {api_key}'
+        if self.auth:
+            headers['authorization'] = 'Basic ' + base64.b64encode(self.auth.encode('utf-8')).decode('ascii')
+        return headers
+
+    def _build_display(self):
+        if self._host_list:
+            scheme = 'https://' if self.use_ssl else 'http://'
+            hosts = ','.join(host if host.startswith(('https://', 'http://')) else scheme + host
+                             for host in self._host_list)
         else:
-            hosts.append(self.cloud_id)
+            hosts = self.cloud_id
 
-        hosts = ','.join(hosts)
         if self.api_key:
             return f'K-{self.api_key[0][:10]} @ {hosts}'
         elif self.token:
@@ -190,27 +232,32 @@ class RefreshingEsClient(BaseClient):
         self.expires_in = expires_in
         self.name = name
         self.delegate = self._build_delegate()
+        self._refresh_lock = threading.Lock()
+        self._expires_at = self._compute_expires_at()
 
     def __getattr__(self, item):
         return getattr(self.delegate, item)
 
     def perform_request(self, method, path, payload=None, deserialize_it=False, **kwargs):
+        from elasticsearch import AuthenticationException
+        # Refresh ahead of expiry so that the user request does not pay for a failed round trip.
+        # This is best-effort since the current token is still valid, the 401 handling below is the fallback.
+        if time.monotonic() >= self._expires_at:
+            try:
+                self._refresh(self.access_token)
+            except Exception as e:
+                _logger.warning(f'Error on refreshing access token ahead of expiry: {e!r}')
+                # Back off so that subsequent requests do not each repeat the failing round trip
+                self._expires_at = time.monotonic() + self._refresh_margin()
+        access_token = self.access_token
         try:
             return self.delegate.perform_request(method, path, payload, deserialize_it, **kwargs)
         except AuthenticationException as e:
+            # Fallback for tokens that expire earlier than expected, e.g. clock skew or restored sessions
             if e.status_code == 401:
-                response = self.parent.perform_request(
-                    'POST', '/_security/oauth2/token',
-                    json.dumps({
-                        'grant_type': 'refresh_token',
-                        'refresh_token': self.refresh_token,
-                    }),
-                    deserialize_it=True)
-                self.access_token = response['access_token']
-                self.refresh_token = response['refresh_token']
-                self.expires_in = response['expires_in']
-                self._build_delegate()
-                self.perform_request(method, path, payload, deserialize_it=deserialize_it, **kwargs)
+                self._refresh(access_token)
+                return self.delegate.perform_request(method, path, payload, deserialize_it, **kwargs)
+            raise
 
     def info(self):
         info = self.delegate.info()
@@ -237,6 +284,29 @@ class RefreshingEsClient(BaseClient):
         else:
             return f'{self.username} @ {self.delegate}'
 
+    def _refresh(self, stale_access_token):
+        with self._refresh_lock:
+            if self.access_token != stale_access_token:
+                return  # Already refreshed by a concurrent caller
+            response = self.parent.perform_request(
+                'POST', '/_security/oauth2/token',
+                json_dumps_bytes({
+                    'grant_type': 'refresh_token',
+                    'refresh_token': self.refresh_token,
+                }),
+                deserialize_it=True)
+            self.refresh_token = response['refresh_token']
+            self.expires_in = response['expires_in']
+            self._expires_at = self._compute_expires_at()
+            self.delegate.update_token(response['access_token'])
+            self.access_token = response['access_token']
+
+    def _compute_expires_at(self):
+        return time.monotonic() + self.expires_in - self._refresh_margin()
+
+    def _refresh_margin(self):
+        return min(_TOKEN_REFRESH_MARGIN, self.expires_in // 2)
+
     def _build_delegate(self):
         return EsClient(
             name=self.name,
@@ -413,8 +483,9 @@ class EsClientManager:
 
     def __str__(self):
         lines = []
-        for i, client in enumerate(self.clients()):
-            prefix = '*' if client == self.current else ' '
+        index_current = self._index_current
+        for i, client in enumerate(self._clients):
+            prefix = '*' if i == index_current else ' '
             index = f'[{i}]'
             lines.append(f'{prefix} {index:>4} {client}')
         return '\n'.join(lines)
@@ -471,13 +542,15 @@ def _connect_userpass(app, **options):
     if not username and password:
         raise PeekError('Username is required for userpass authentication')
 
+    use_keyring = app.config.as_bool('use_keyring')
+
     if options['force_prompt']:
         password = app.input(message='Please enter password: ', is_secret=True)
 
     if username and not password:
         password = os.environ.get('PEEK_PASSWORD', None)
         if not password:
-            if app.config.as_bool('use_keyring'):
+            if use_keyring:
                 password = _keyring(service_name, username)
                 if not password:
                     if options['no_prompt']:
@@ -489,7 +562,7 @@ def _connect_userpass(app, **options):
                     raise PeekError('Password is not found and password prompt is disabled')
                 password = app.input(message='Please enter password: ', is_secret=True)
 
-    if username and password and app.config.as_bool('use_keyring'):
+    if username and password and use_keyring:
         _keyring(service_name, username, password)
 
     return EsClient(
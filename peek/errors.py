@@ -10,31 +10,39 @@ class PeekSyntaxError(PeekError):
         self.text = text
         self.error_token = error_token
         self.title = title or 'Syntax error'
-        self.message = message
+        # The message can also be a callable so that it is only formatted when needed
+        self._message = message
+
+    @property
+    def message(self):
+        if callable(self._message):
+            self._message = self._message()
+        return self._message
 
     def __str__(self):
-        text_before_error = self.text[:self.error_token.index]
-        last_linesep = text_before_error.rfind(os.linesep)
+        message = self.message
+        # Locate the error line with bounded searches instead of slicing the whole text around the error
+        index = self.error_token.index
+        last_linesep = self.text.rfind(os.linesep, 0, index)
         if last_linesep == -1:
-            line = text_before_error
+            line_start = 0
             line_index = 0
         else:
-            line = text_before_error[last_linesep + len(os.linesep):]
-            line_index = text_before_error.count(os.linesep)
-        col_index = len(line)
+            line_start = last_linesep + len(os.linesep)
+            line_index = self.text.count(os.linesep, 0, index)
+        col_index = index - line_start
 
-        text_since_error = self.text[self.error_token.index:]
-        next_linesep = text_since_error.find(os.linesep)
+        next_linesep = self.text.find(os.linesep, index)
         if next_linesep == -1:
-            line += text_since_error
+            line = self.text[line_start:]
         else:
-            line += text_since_error[:next_linesep]
+            line = self.text[line_start:next_linesep]
 
         return f'{self.title} at Line {line_index + 1}, Column {col_index + 1}:\n' \
                f'{line}\n' \
                f'{" " * col_index}' \
                f'{"^" * len(self.error_token.value)}' \
-               f'{os.linesep + self.message if self.message else ""}'
+               f'{os.linesep + message if message else ""}'
 
 
 class InvalidEsApiCall(PeekError):
@@ -6,7 +6,7 @@ from unittest.mock import MagicMock
 
 from configobj import ConfigObj
 
-from peek.ast import NameNode, SymbolNode, DictNode, BinOpNode, TextNode, Node
+from peek.ast import NameNode, SymbolNode, BinOpNode, TextNode, Node
 from peek.config import config_location
 from peek.parser import PeekParser
 from peek.visitors import FormattingVisitor
@@ -247,6 +247,7 @@ mock_app.parser = PeekParser()
 
 
 class JsSpecEvaluator(PeekVM):
+    resolve_dict_key_names = False
 
     def __init__(self):
         super().__init__(mock_app)
@@ -281,16 +282,13 @@ class JsSpecEvaluator(PeekVM):
             node.right_node = TextNode(node.right_node.token)
         super(JsSpecEvaluator, self).visit_bin_op_node(node)
 
-    def visit_dict_node(self, node: DictNode):
-        d_ref = Ref()
-        with self.consumer(lambda v: d_ref.set(v)):
-            self._do_visit_dict_node(node, resolve_key_name=False)
-        d = d_ref.get()
+    def _build_dict(self, keys, values):
+        d = super()._build_dict(keys, values)
         if d.get('...', None) is not None:
             splat = d.pop('...')
             assert isinstance(splat, dict), f'Cannot splat type other than dict, got: {splat!r}'
             d.update(splat)
-        self.consume(d)
+        return d
 
     def visit_symbol_node(self, node: SymbolNode):
         self.consume(self.get_value(node.token.value))
@@ -1,7 +1,8 @@
 import datetime
 import sqlite3
+import time
 from os.path import expanduser
-from typing import Iterable, List
+from typing import Iterable
 
 from prompt_toolkit.history import History
 
@@ -18,6 +19,9 @@ class SqLiteHistory(History):
         db_file = expanduser(config_location() + 'history')
         ensure_dir_exists(db_file)
         self.conn = sqlite3.connect(db_file)
+        # WAL with normal sync avoids an fsync on every commit while remaining safe against corruption
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
         self.conn.execute('CREATE TABLE IF NOT EXISTS history '
                           '(id INTEGER PRIMARY KEY AUTOINCREMENT, content TEXT NOT NULL, timestamp INTEGER NOT NULL)')
         self.conn.execute('CREATE TABLE IF NOT EXISTS connection '
@@ -29,21 +33,18 @@ class SqLiteHistory(History):
         self.conn.close()
 
     def _maintain_size(self):
-        c = self.conn.cursor()
-        res = c.execute('SELECT COUNT(*) from history').fetchone()
-        if res is None or res[0] < self.history_max:
-            return
-        c.execute('DELETE FROM history where id in (SELECT id FROM history ORDER BY id limit ?)',
-                  (res[0] - self.history_max,))
+        # Keep only the latest history_max entries. The subquery walks the primary key index
+        # backwards and yields NULL, i.e. deletes nothing, when there are not enough entries.
+        self.conn.execute('DELETE FROM history WHERE id <= '
+                          '(SELECT id FROM history ORDER BY id DESC LIMIT 1 OFFSET ?)',
+                          (self.history_max,))
 
     def load_history_strings(self) -> Iterable[str]:
-        strings: List[str] = []
-        for row in self.conn.execute('SELECT * FROM history ORDER BY id DESC'):
-            strings.append(row[1])
-        return strings
+        for (content,) in self.conn.execute('SELECT content FROM history ORDER BY id DESC'):
+            yield content
 
     def store_string(self, string: str) -> None:
-        self.conn.execute("INSERT INTO history(content, timestamp) VALUES (?, ?)", (string, datetime.datetime.now()))
+        self.conn.execute("INSERT INTO history(content, timestamp) VALUES (?, ?)", (string, int(time.time())))
         self.conn.commit()
 
     def load_recent(self, size=100):
@@ -17,6 +17,16 @@ from peek.visitors import FormattingVisitor
 
 _logger = logging.getLogger(__name__)
 
+# How much each bracket token changes the balance, opening brackets are negative
+_BRACKET_DELTAS = {
+    ParenLeft: -1,
+    BracketLeft: -1,
+    CurlyLeft: -1,
+    ParenRight: 1,
+    BracketRight: 1,
+    CurlyRight: 1,
+}
+
 
 def key_bindings(app):
     kb = KeyBindings()
@@ -250,12 +260,7 @@ def buffer_should_be_handled(app):
                             return True
                     _logger.debug('Cursor is inside triple quotes')
                     return False
-                balance = 0
-                for t in tokens:
-                    if t.ttype in (ParenLeft, BracketLeft, CurlyLeft):
-                        balance -= 1
-                    elif t.ttype in (ParenRight, BracketRight, CurlyRight):
-                        balance += 1
+                balance = sum(_BRACKET_DELTAS.get(t.ttype, 0) for t in tokens)
 
                 if balance < 0:
                     _logger.debug('Cursor is inside brackets')
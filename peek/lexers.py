@@ -313,16 +313,16 @@ class PeekLexer(RegexLexer):
         Convert DictKey to common string if it is part of an expression
         """
         stack = stack or self.stack
-        stream = super().get_tokens_unprocessed(text, stack)
+        stream = map(PeekToken._make, super().get_tokens_unprocessed(text, stack))
         buffer = []
         while True:
             try:
-                pt = PeekToken(*next(stream))
+                pt = next(stream)
                 if pt.ttype is DictKey:
                     assert 0 == len(buffer)
                     buffer.append(pt)
                     while True:
-                        pt_next = PeekToken(*next(stream))
+                        pt_next = next(stream)
                         if pt_next.ttype in (DictKey, Whitespace, Comment.Single):
                             buffer.append(pt_next)
                         elif pt_next.ttype is Colon:
@@ -390,5 +390,4 @@ class UrlPathLexer(RegexLexer):
     }
 
     def get_tokens_unprocessed(self, text, stack=('root',)) -> PeekToken:
-        for t in super().get_tokens_unprocessed(text, stack):
-            yield PeekToken(*t)
+        yield from map(PeekToken._make, super().get_tokens_unprocessed(text, stack))
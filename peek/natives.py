@@ -1,3 +1,4 @@
+import importlib
 import json
 import logging
 import os
@@ -10,9 +11,6 @@ from peek.config import config_location
 from peek.connection import ConnectFunc, EsClientManager
 from peek.display import PeekEncoder
 from peek.errors import PeekError
-from peek.krb import KrbAuthenticateFunc
-from peek.oidc import OidcAuthenticateFunc
-from peek.saml import SamlAuthenticateFunc
 
 _logger = logging.getLogger(__name__)
 
@@ -356,6 +354,31 @@ class DownloadApiSpecsFunc:
                'It may takes a few minutes depending on the network speed.'
 
 
+class LazyFunc:
+    """
+    Proxy of a builtin function whose module is only imported when the function is first used
+    """
+
+    def __init__(self, spec):
+        self._spec = spec
+        self._func = None
+
+    def __call__(self, app, *args, **options):
+        return self._load()(app, *args, **options)
+
+    def __getattr__(self, item):
+        # Private and special names, e.g. probes from copy or pickle, must not trigger the import
+        if item.startswith('_'):
+            raise AttributeError(item)
+        return getattr(self._load(), item)
+
+    def _load(self):
+        if self._func is None:
+            module_name, class_name = self._spec.split(':')
+            self._func = getattr(importlib.import_module(module_name), class_name)()
+        return self._func
+
+
 def consolidate_options(options, defaults):
     """
     Merge shorthanded @symbol into normal options kv pair with provided defaults
@@ -383,7 +406,7 @@ EXPORTS = {
     'exit': ExitFunc(),
     'help': HelpFunc(),
     '_download_api_specs': DownloadApiSpecsFunc(),
-    'saml_authenticate': SamlAuthenticateFunc(),
-    'oidc_authenticate': OidcAuthenticateFunc(),
-    'krb_authenticate': KrbAuthenticateFunc(),
+    'saml_authenticate': LazyFunc('peek.saml:SamlAuthenticateFunc'),
+    'oidc_authenticate': LazyFunc('peek.oidc:OidcAuthenticateFunc'),
+    'krb_authenticate': LazyFunc('peek.krb:KrbAuthenticateFunc'),
 }
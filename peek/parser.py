@@ -1,6 +1,7 @@
 import ast
 import json
 import logging
+import sys
 from enum import Enum
 from typing import Iterable, NamedTuple, Callable
 
@@ -18,6 +19,7 @@ from peek.lexers import PeekLexer, BlankLine, CurlyLeft, DictKey, Colon, \
 _logger = logging.getLogger(__name__)
 
 HTTP_METHODS = [m.upper() for m in HTTP_METHODS]
+_HTTP_METHODS_SET = frozenset(HTTP_METHODS)
 
 _BIN_OP_ORDERS = {
     None: -1,
@@ -29,6 +31,40 @@ _BIN_OP_ORDERS = {
     '.': 300,
 }
 
+# Processed tokens of recently parsed texts are cached since the same statements and
+# payloads, e.g. payload files and loop bodies, are often parsed repeatedly. The cache
+# is bounded by the total length of cached texts, which the token lists scale with.
+# Each cached character keeps roughly 20 to 50 bytes of tokens and substrings alive,
+# so a full cache retains a few MB for as long as the parser lives.
+_TOKENS_CACHE_MAX_CHARS = 128 * 1024
+_TOKENS_CACHE_MAX_TEXT_LENGTH = 16 * 1024
+
+# The lexer keeps no per-parse state, so all parsers share a single instance
+_SHARED_LEXER = PeekLexer()
+
+# Tokens that are dropped from the processed token stream
+_SKIPPED_TTYPES = frozenset((Whitespace, Comment.Single))
+
+
+class _TtypeMembership(dict):
+    """
+    Memoized check of whether a token type is one of or a subtype of the given token types.
+    The pygments subtype check is a Python level call, this makes it a dict lookup per type.
+    """
+
+    def __init__(self, *ttypes):
+        super().__init__()
+        self.ttypes = ttypes
+
+    def __missing__(self, ttype):
+        is_member = self[ttype] = any(ttype in t for t in self.ttypes)
+        return is_member
+
+
+# Tokens that are merged with adjacent tokens of the same type
+_MERGED_TTYPES = _TtypeMembership(String, BlankLine, Error)
+_ERROR_TTYPES = _TtypeMembership(Token.Error)
+
 
 class ParserEventType(Enum):
     ES_METHOD = 'ES_METHOD'
@@ -73,12 +109,16 @@ class PeekParser:
     The parser is not thread safe and does not pretend to be.
     """
 
-    def __init__(self, listeners=None):
-        self.lexer = PeekLexer()
+    def __init__(self, listeners=None, cache_tokens=True):
+        self.lexer = _SHARED_LEXER
         self.text = ''
         self.position = 0  # position is token position, not character
         self.tokens = []
+        self._eof_token = PeekToken(0, EOF, '\0')
         self.listeners: Iterable[Callable] = listeners or []
+        # Short-lived parsers, e.g. the ones of the completer, should not bother caching
+        self._tokens_cache = {} if cache_tokens else None
+        self._tokens_cache_chars = 0
 
     def parse(self, text, payload_only=False, fail_fast_on_error_token=True, last_stmt_only=False, log_level=None):
         saved_log_level = _logger.getEffectiveLevel()
@@ -88,9 +128,10 @@ class PeekParser:
             self.text = text
             self.position = 0
             self.tokens = []
+            self._eof_token = PeekToken(len(text), EOF, '\0')
 
             stack = ('dict',) if payload_only else ('root',)
-            self.tokens = process_tokens(self.lexer.get_tokens_unprocessed(self.text, stack=stack))
+            self.tokens = self._tokenize(self.text, stack)
             if last_stmt_only:
                 idx_last_stmt_token = find_last_stmt_token(self.tokens)
                 if idx_last_stmt_token == -1:
@@ -100,7 +141,7 @@ class PeekParser:
 
             if fail_fast_on_error_token:
                 for token in self.tokens[self.position:]:
-                    if token.ttype in Token.Error:
+                    if _ERROR_TTYPES[token.ttype]:
                         raise PeekSyntaxError(self.text, token, message='Found error token and fail fast is enabled')
 
             return self._do_parse_payload() if payload_only else self._do_parse()
@@ -108,6 +149,25 @@ class PeekParser:
             if log_level is not None:
                 _logger.setLevel(saved_log_level)
 
+    def _tokenize(self, text, stack):
+        """
+        Lex and process the text into tokens with a bounded LRU cache. The cached
+        token lists are shared and must not be modified.
+        """
+        if self._tokens_cache is None or len(text) > _TOKENS_CACHE_MAX_TEXT_LENGTH:
+            return process_tokens(self.lexer.get_tokens_unprocessed(text, stack=stack))
+        key = (text, stack)
+        tokens = self._tokens_cache.pop(key, None)
+        if tokens is None:
+            tokens = process_tokens(self.lexer.get_tokens_unprocessed(text, stack=stack))
+            self._tokens_cache_chars += len(text)
+            while self._tokens_cache_chars > _TOKENS_CACHE_MAX_CHARS:
+                oldest_text, _ = oldest_key = next(iter(self._tokens_cache))
+                del self._tokens_cache[oldest_key]
+                self._tokens_cache_chars -= len(oldest_text)
+        self._tokens_cache[key] = tokens
+        return tokens
+
     def _do_parse(self):
         nodes = []
         while self._peek_token().ttype is not EOF:
@@ -126,36 +186,29 @@ class PeekParser:
 
     def _parse_stmt(self):
         token = self._peek_token()
-        if token.ttype is FuncName:
-            return self._parse_func_call()
-        elif token.ttype is HttpMethod:
-            return self._parse_es_api_call()
-        elif token.ttype is Let:
-            return self._parse_let_stmt()
-        elif token.ttype is ShellOut:
-            return self._parse_shell_out()
-        elif token.ttype is For:
-            return self._parse_for_stmt()
-        else:
+        parse_func = self._STMT_PARSE_FUNCS.get(token.ttype)
+        if parse_func is None:
             raise PeekSyntaxError(
                 self.text, token,
                 title='Invalid token',
                 message='Expect beginning of a statement')
+        return parse_func(self)
 
     def _parse_es_api_call(self):
         self._publish_event(ParserEventType.ES_METHOD)
         method_token = self._consume_token(HttpMethod)
         method_node = NameNode(method_token)
-        if method_token.value.upper() not in HTTP_METHODS:
+        if method_token.value.upper() not in _HTTP_METHODS_SET:
             raise PeekSyntaxError(
                 self.text, method_token,
                 title='Invalid HTTP method',
                 message=f'Expect HTTP method of value in {HTTP_METHODS!r}, got {method_token.value!r}')
 
-        if self._peek_token().ttype is Literal:
+        ttype = self._peek_token().ttype
+        if ttype is Literal:
             self._publish_event(ParserEventType.ES_URL)
             path_node = TextNode(self._consume_token(Literal))
-        elif self._peek_token().ttype is ParenLeft:
+        elif ttype is ParenLeft:
             self._publish_event(ParserEventType.BEFORE_ES_URL_EXPR)
             path_node = self._parse_expr()
             self._publish_event(ParserEventType.AFTER_ES_URL_EXPR)
@@ -273,7 +326,7 @@ class PeekParser:
         elif token.ttype in (String.Double, String.Single, TripleS, TripleD):
             return StringNode(self._consume_token(token.ttype))
         else:
-            raise PeekSyntaxError(self.text, token, message=f'Unexpected token when parsing for value: {token!r}')
+            raise PeekSyntaxError(self.text, token, message=lambda: f'Unexpected token when parsing for value: {token!r}')
 
     def _parse_func_call(self):
         self._publish_event(ParserEventType.FUNC_STMT)
@@ -286,27 +339,31 @@ class PeekParser:
         symbol_nodes = []
         arg_nodes = []
         kwarg_nodes = []
-        while self._peek_token().ttype is not EOF:
-            if self._peek_token().ttype is BlankLine:
+        while True:
+            ttype = self._peek_token().ttype
+            if ttype is EOF:
+                break
+            elif ttype is BlankLine:
                 self._consume_token(BlankLine)
                 if is_stmt:
                     break
-            elif self._peek_token().ttype is ParenRight:
+            elif ttype is ParenRight:
                 if is_stmt:
                     raise PeekSyntaxError(
                         self.text, self._peek_token(),
                         message='Found function expression while parsing for function stmt')
                 else:
                     break
-            elif self._peek_token().ttype is Name:
+            elif ttype is Name:
                 self._publish_event(ParserEventType.FUNC_OPTION_NAME_OR_ARG)
                 n = NameNode(self._consume_token(Name))
-                if self._peek_token().ttype is Assign:
+                next_ttype = self._peek_token().ttype
+                if next_ttype is Assign:
                     self._consume_token(Assign)
                     self._publish_event(ParserEventType.BEFORE_FUNC_OPTION_VALUE)
                     kwarg_nodes.append(KeyValueNode(n, self._parse_expr()))
                     self._publish_event(ParserEventType.AFTER_FUNC_OPTION_VALUE)
-                elif self._peek_token().ttype is ParenLeft:  # nested function expr
+                elif next_ttype is ParenLeft:  # nested function expr
                     self._consume_token(ParenLeft)
                     sub_symbol_nodes, sub_arg_nodes, sub_kwarg_nodes = self._parse_func_call_args(is_stmt=False)
                     arg_nodes.append(FuncCallNode(
@@ -319,7 +376,7 @@ class PeekParser:
                     self._consume_token(ParenRight)
                 else:
                     arg_nodes.append(self._parse_expr_after_left_operand(n))
-            elif self._peek_token().ttype is At:
+            elif ttype is At:
                 self._publish_event(ParserEventType.BEFORE_FUNC_SYMBOL_ARG)
                 self._consume_token(At)
                 symbol_nodes.append(SymbolNode(self._consume_token(Literal)))
@@ -342,14 +399,15 @@ class PeekParser:
         else:
             unary_op_token = None
 
-        if self._peek_token().ttype is ParenLeft:
+        ttype = self._peek_token().ttype
+        if ttype is ParenLeft:
             pl = self._consume_token(ParenLeft)
             n = self._parse_expr()
             pr = self._consume_token(ParenRight)
             n = GroupNode(n, pl, pr)
-        elif self._peek_token().ttype is Name:
+        elif ttype is Name:
             n = NameNode(self._consume_token(Name))
-        elif self._peek_token().ttype is At:
+        elif ttype is At:
             self._consume_token(At)
             n = SymbolNode(self._consume_token(Literal))
         else:
@@ -359,8 +417,9 @@ class PeekParser:
 
     def _parse_expr_after_left_operand(self, n, unary_op_token=None, last_bin_op=None):
         while True:
-            if self._peek_token().ttype is BinOp:
-                op_token = self._peek_token()
+            token = self._peek_token()
+            if token.ttype is BinOp:
+                op_token = token
                 if _BIN_OP_ORDERS[last_bin_op] >= _BIN_OP_ORDERS[op_token.value]:
                     return n if unary_op_token is None else UnaryOpNode(unary_op_token, n)
                 else:
@@ -368,7 +427,7 @@ class PeekParser:
                     right_node = self._parse_expr(last_bin_op=op_token.value)
                     n = n if unary_op_token is None else UnaryOpNode(unary_op_token, n)
                     n = BinOpNode(op_token, n, right_node)
-            elif self._peek_token().ttype is ParenLeft:  # func call
+            elif token.ttype is ParenLeft:  # func call
                 if last_bin_op == '.':
                     return n if unary_op_token is None else UnaryOpNode(unary_op_token, n)
                 else:
@@ -388,19 +447,19 @@ class PeekParser:
             unary_op_token = None
 
     def _peek_token(self) -> PeekToken:
-        if self.position >= len(self.tokens):
-            return PeekToken(len(self.text), EOF, '\0')
-        return self.tokens[self.position]
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return self._eof_token
 
     def _consume_token(self, ttype, value=None) -> PeekToken:
         token = self._peek_token()
         self.position += 1
         if token.ttype is not ttype:
             raise PeekSyntaxError(self.text, token,
-                                  message=f'Expect token of type {ttype!r}, got {token.ttype!r}')
+                                  message=lambda: f'Expect token of type {ttype!r}, got {token.ttype!r}')
         if value and (token.value != value or token.value not in value):
             raise PeekSyntaxError(self.text, token,
-                                  message=f'Expect token of value {value!r}, got {token.value!r}')
+                                  message=lambda: f'Expect token of value {value!r}, got {token.value!r}')
         self._publish_event(ParserEventType.AFTER_TOKEN, token)
         return token
 
@@ -409,6 +468,15 @@ class PeekParser:
         for listener in self.listeners:
             listener(ParserEvent(event_type, token))
 
+    # Statement parsing is dispatched on the type of the token that starts the statement
+    _STMT_PARSE_FUNCS = {
+        FuncName: _parse_func_call,
+        HttpMethod: _parse_es_api_call,
+        Let: _parse_let_stmt,
+        ShellOut: _parse_shell_out,
+        For: _parse_for_stmt,
+    }
+
 
 def normalise_string(value):
     return json.dumps(ast.literal_eval(value))
@@ -420,32 +488,47 @@ def process_tokens(tokens: Iterable[PeekToken]):
     should be represented as one, e.g. Strings, BlankLine, Error.
     """
     processed_tokens = []
+    append = processed_tokens.append
+    # The run of tokens being merged is kept as its first token plus the value parts
     current_token = None
+    parts = []
+
     for token in tokens:
-        if token.ttype in (Whitespace, Comment.Single):
+        ttype = token.ttype
+        if ttype in _SKIPPED_TTYPES:
             if current_token is not None:
-                processed_tokens.append(current_token)
+                append(_merge_token(current_token, parts))
                 current_token = None
-        elif token.ttype in String or token.ttype is BlankLine or token.ttype is Error:
-            if current_token is not None and current_token.ttype is token.ttype:
-                current_token = PeekToken(
-                    current_token.index, current_token.ttype, current_token.value + token.value)
+        elif _MERGED_TTYPES[ttype]:
+            if current_token is not None and current_token.ttype is ttype:
+                parts.append(token.value)
             else:
                 # two consecutive strings with different quotes should not be merged
                 if current_token is not None:
-                    processed_tokens.append(current_token)
+                    append(_merge_token(current_token, parts))
                 current_token = token
+                parts = [token.value]
         else:
             if current_token is not None:
-                processed_tokens.append(current_token)
+                append(_merge_token(current_token, parts))
                 current_token = None
-            processed_tokens.append(token)
+            append(token)
     if current_token is not None:
-        processed_tokens.append(current_token)
+        append(_merge_token(current_token, parts))
 
     return processed_tokens
 
 
+def _merge_token(first_token: PeekToken, parts) -> PeekToken:
+    if len(parts) == 1:
+        return first_token
+    value = ''.join(parts)
+    if first_token.ttype is DictKey:
+        # Dict keys repeat a lot, e.g. "_index" in bulk payloads, so share a single copy
+        value = sys.intern(value)
+    return PeekToken(first_token.index, first_token.ttype, value)
+
+
 def find_last_stmt_token(tokens) -> int:
     """
     Find the last token that can start a statement
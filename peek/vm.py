@@ -1,26 +1,26 @@
 import ast
+import functools
 import itertools
 import json
 import logging
 import operator
 import os
+import re
 import sys
 import warnings
 from numbers import Number
 from subprocess import Popen
 
-import elasticsearch
-from pygments.token import Name
+from pygments.token import Name, Literal
 
 from peek.ast import Visitor, EsApiCallNode, DictNode, KeyValueNode, ArrayNode, NumberNode, \
     StringNode, Node, FuncCallNode, NameNode, TextNode, ShellOutNode, EsApiCallInlinePayloadNode, \
     EsApiCallFilePayloadNode, GroupNode, BinOpNode, UnaryOpNode, SymbolNode, LetNode, ForInNode
+from peek.common import json_dumps_bytes
 from peek.errors import PeekError
 from peek.natives import EXPORTS
 from peek.visitors import Ref
 
-warnings_available = elasticsearch.__version__ >= (7, 7, 0)
-
 _logger = logging.getLogger(__name__)
 
 
@@ -62,8 +62,19 @@ _UNARY_OP_FUNCS = {
     '-': operator.neg,
 }
 
+# Sentinel for name lookups so that a variable can legitimately hold null
+_MISSING = object()
+
+# Actions of the work stack used by PeekVM.evaluate
+_EVAL = 'EVAL'
+_PUSH = 'PUSH'
+_BUILD_DICT = 'BUILD_DICT'
+_BUILD_LIST = 'BUILD_LIST'
+
 
 class PeekVM(Visitor):
+    # Whether names used as dict keys are resolved as variables
+    resolve_dict_key_names = True
 
     def __init__(self, app):
         super().__init__()
@@ -90,18 +101,14 @@ class PeekVM(Visitor):
             path = path_ref.get()
             path = path if path.startswith('/') else ('/' + path)
 
-        options = Ref()
-        with self.consumer(lambda v: options.set(v)):
-            self._do_visit_dict_node(node.options_node)
-        options = options.get()
+        options = self.evaluate(node.options_node, resolve_key_name=False)
 
         if isinstance(node, EsApiCallInlinePayloadNode):
-            dicts = []
-            with self.consumer(lambda v: dicts.append(v)):
+            buf = bytearray()
+            with self.consumer(functools.partial(_append_ndjson_line, buf)):
                 for dict_node in node.dict_nodes:
                     dict_node.accept(self)
-            lines = [json.dumps(d) for d in dicts]
-            payload = ('\n'.join(lines) + '\n') if lines else None
+            payload = bytes(buf) if buf else None
         elif isinstance(node, EsApiCallFilePayloadNode):
             f_ref = Ref()
             with self.consumer(lambda v: f_ref.set(v)):
@@ -109,15 +116,14 @@ class PeekVM(Visitor):
             with open(os.path.expanduser(f_ref.get().strip())) as ins:
                 payload = ins.read()
                 if self.app.config.as_bool('parse_payload_file'):
-                    dicts = []
-                    with self.consumer(lambda v: dicts.append(v)):
+                    buf = bytearray()
+                    with self.consumer(functools.partial(_append_ndjson_line, buf)):
                         # NOTE this reuses the parser from the main app. It is not a problem
                         # because parser always finishes its job before returning. So in a
                         # single thread execution model, we won't corrupt the internals.
                         for pnode in self.app.parser.parse(payload, payload_only=True):
                             self.execute_node(pnode)
-                    lines = [json.dumps(d) for d in dicts]
-                    payload = ('\n'.join(lines) + '\n') if lines else None
+                    payload = bytes(buf) if buf else None
                 elif not payload.endswith('\n'):
                     payload += '\n'
         else:
@@ -168,24 +174,16 @@ class PeekVM(Visitor):
         if not callable(func):
             raise PeekError(f'{node.name_node!r} is not a callable, but {func!r}')
 
-        func_symbols = Ref()
-        with self.consumer(lambda v: func_symbols.set(v)):
-            node.symbols_node.accept(self)
-
-        func_args = Ref()
-        with self.consumer(lambda v: func_args.set(v)):
-            node.args_node.accept(self)
+        func_symbols = self.evaluate(node.symbols_node)
+        func_args = self.evaluate(node.args_node)
 
         for kv_node in node.kwargs_node.kv_nodes:
             assert isinstance(kv_node.key_node, NameNode), f'{kv_node.key_node!r}'
-        func_kwargs = Ref()
-        with self.consumer(lambda v: func_kwargs.set(v)):
-            self._do_visit_dict_node(node.kwargs_node, resolve_key_name=False)
-        kwargs = func_kwargs.get()
-        if func_symbols.get():
-            kwargs['@'] = func_symbols.get()
+        kwargs = self.evaluate(node.kwargs_node, resolve_key_name=False)
+        if func_symbols:
+            kwargs['@'] = func_symbols
         try:
-            result = func(self.app, *func_args.get(), **kwargs)
+            result = func(self.app, *func_args, **kwargs)
             if node.is_stmt:
                 self.app.display.info(result)
             else:
@@ -197,7 +195,7 @@ class PeekVM(Visitor):
     def visit_let_node(self, node: LetNode):
         for kv_node in node.assignments_node.kv_nodes:
             lhs_chain = []
-            with self.consumer(lambda v: lhs_chain.append(v)):
+            with self.consumer(lhs_chain.append):
                 self._unwind_lhs(kv_node.key_node)
 
             rhs = Ref()
@@ -260,20 +258,16 @@ class PeekVM(Visitor):
         self.consume(node.token.value)
 
     def visit_string_node(self, node: StringNode):
-        self.consume(ast.literal_eval(node.token.value))
+        self.consume(_eval_string(node.token.value))
 
     def visit_number_node(self, node: NumberNode):
-        self.consume(ast.literal_eval(node.token.value))
+        self.consume(_eval_number(node.token.ttype, node.token.value))
 
     def visit_dict_node(self, node: DictNode):
-        self._do_visit_dict_node(node, resolve_key_name=True)
+        self.consume(self.evaluate(node))
 
     def visit_array_node(self, node: ArrayNode):
-        values = []
-        with self.consumer(lambda v: values.append(v)):
-            for node in node.value_nodes:
-                node.accept(self)
-        self.consume(values)
+        self.consume(self.evaluate(node))
 
     def visit_text_node(self, node: TextNode):
         if node.token.ttype is Name.Builtin:
@@ -308,26 +302,68 @@ class PeekVM(Visitor):
     def visit_group_node(self, node: GroupNode):
         node.grouped.accept(self)
 
-    def _do_visit_dict_node(self, node: DictNode, resolve_key_name=False):
-        keys = []
-        values = []
-        with self.consumer(lambda v: keys.append(v)):
-            for kv_node in node.kv_nodes:
-                if resolve_key_name or not isinstance(kv_node.key_node, NameNode):
-                    kv_node.key_node.accept(self)
+    def evaluate(self, node: Node, resolve_key_name=None):
+        """
+        Evaluate the node into a value. Dicts, arrays and literals are walked iteratively with
+        an explicit work stack and an operand stack. Other nodes, e.g. names and operators,
+        are delegated to the visitor and must produce exactly one value. The resolve_key_name
+        flag applies to the outermost dict and defaults to resolve_dict_key_names, which always
+        applies to nested dicts.
+        """
+        if resolve_key_name is None:
+            resolve_key_name = self.resolve_dict_key_names
+        operands = []
+        work = [(_EVAL, node)]
+        while work:
+            action, item = work.pop()
+            if action is _EVAL:
+                if isinstance(item, DictNode):
+                    work.append((_BUILD_DICT, (len(operands), len(item.kv_nodes))))
+                    for kv_node in reversed(item.kv_nodes):
+                        work.append((_EVAL, kv_node.value_node))
+                        if resolve_key_name or not isinstance(kv_node.key_node, NameNode):
+                            work.append((_EVAL, kv_node.key_node))
+                        else:
+                            work.append((_PUSH, kv_node.key_node.token.value))
+                elif isinstance(item, ArrayNode):
+                    work.append((_BUILD_LIST, (len(operands), len(item.value_nodes))))
+                    for value_node in reversed(item.value_nodes):
+                        work.append((_EVAL, value_node))
+                elif isinstance(item, StringNode):
+                    operands.append(_eval_string(item.token.value))
+                elif isinstance(item, NumberNode):
+                    operands.append(_eval_number(item.token.ttype, item.token.value))
                 else:
-                    self.consume(kv_node.key_node.token.value)
-                with self.consumer(lambda v: values.append(v)):
-                    kv_node.value_node.accept(self)
-        assert len(keys) == len(values), f'key length is not equal to value length: {keys!r}, {values!r}'
-        self.consume(dict(zip(keys, values)))
+                    with self.consumer(operands.append):
+                        item.accept(self)
+                # Only the outermost dict may skip resolving key names
+                resolve_key_name = self.resolve_dict_key_names
+            elif action is _PUSH:
+                operands.append(item)
+            elif action is _BUILD_DICT:
+                start, n = item
+                items = operands[start:]
+                assert len(items) == 2 * n, f'key length is not equal to value length: {items!r}'
+                del operands[start:]
+                operands.append(self._build_dict(items[::2], items[1::2]))
+            else:  # _BUILD_LIST
+                start, n = item
+                values = operands[start:]
+                assert len(values) == n, f'expect {n} array values, got: {values!r}'
+                del operands[start:]
+                operands.append(values)
+        assert len(operands) == 1, f'expect a single value, got: {operands!r}'
+        return operands[0]
+
+    def _build_dict(self, keys, values):
+        return dict(zip(keys, values))
 
     def get_value(self, name):
-        value = self.builtins.get(name)
-        if value is None:
-            value = self.context.get(name)
-        if value is None:
-            raise NameError(f'Unknown name: {name!r}')
+        value = self.builtins.get(name, _MISSING)
+        if value is _MISSING:
+            value = self.context.get(name, _MISSING)
+            if value is _MISSING:
+                raise NameError(f'Unknown name: {name!r}')
         return value
 
     def _unwind_lhs(self, node: Node):
@@ -355,10 +391,10 @@ class PeekVM(Visitor):
                 if os.path.isfile(p):
                     self._load_one_extension(p)
                 elif os.path.isdir(p):
-                    for f in os.listdir(p):
-                        if not f.endswith('.py'):
-                            continue
-                        self._load_one_extension(os.path.join(p, f))
+                    with os.scandir(p) as it:
+                        for entry in it:
+                            if entry.name.endswith('.py') and entry.is_file():
+                                self._load_one_extension(entry.path)
                 else:
                     _logger.warning(f'Cannot load extension path: {p}')
         finally:
@@ -397,13 +433,78 @@ class PeekVM(Visitor):
         return ' '.join(parts)
 
     def _should_show_warnings(self, w):
-        if warnings_available and self.app.config.as_bool('show_warnings'):
+        if self.app.config.as_bool('show_warnings'):
+            import elasticsearch
+            if elasticsearch.__version__ < (7, 7, 0):
+                return False
             from elasticsearch.exceptions import ElasticsearchDeprecationWarning
             return w.category == ElasticsearchDeprecationWarning
         else:
             return False
 
 
+_ESCAPE_RE = re.compile(r'\\(.)', re.DOTALL)
+_SIMPLE_ESCAPES = {
+    '\\': '\\', "'": "'", '"': '"',
+    'a': '\a', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v',
+}
+
+
+# Longer literals, e.g. base64 encoded attachments, are not cached. They would be pinned in memory
+# and hashing the key costs about as much as evaluating them.
+_STRING_CACHE_MAX_LENGTH = 256
+
+
+def _eval_string(value: str) -> str:
+    if len(value) > _STRING_CACHE_MAX_LENGTH:
+        return _eval_string_literal(value)
+    return _eval_cached_string_literal(value)
+
+
+def _eval_string_literal(value: str) -> str:
+    """
+    Evaluate a quoted string literal. The quotes are sliced off directly and simple escapes
+    are replaced by table lookup. Anything else, e.g. unicode escapes, falls back to the
+    full Python literal evaluation.
+    """
+    quote = value[:3] if value[:3] in ('"""', "'''") else value[:1]
+    if len(value) >= 2 * len(quote) and value.endswith(quote):
+        inner = value[len(quote):-len(quote)]
+        if '\\' not in inner:
+            if quote not in inner:
+                return inner
+        else:
+            # What is left after dropping the escapes must not be able to end the string early
+            remainder = _ESCAPE_RE.sub('', inner) + value[-len(quote):]
+            if remainder.find(quote) == len(remainder) - len(quote) and '\\' not in remainder \
+                    and all(c in _SIMPLE_ESCAPES for c in _ESCAPE_RE.findall(inner)):
+                return _ESCAPE_RE.sub(lambda m: _SIMPLE_ESCAPES[m.group(1)], inner)
+    return ast.literal_eval(value)
+
+
+_eval_cached_string_literal = functools.lru_cache(maxsize=1024)(_eval_string_literal)
+
+
+@functools.lru_cache(maxsize=1024)
+def _eval_number(ttype, value: str):
+    try:
+        if ttype is Literal.Number.Integer:
+            return int(value)
+        elif ttype is Literal.Number.Float:
+            return float(value)
+    except ValueError:
+        pass  # e.g. complex numbers
+    return ast.literal_eval(value)
+
+
+def _append_ndjson_line(buf: bytearray, d):
+    """
+    Encode the dict straight into the payload buffer so that it is not retained after encoding
+    """
+    buf += json_dumps_bytes(d)
+    buf += b'\n'
+
+
 def _maybe_decode_json(r):
     try:
         return json.loads(r)
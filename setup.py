@@ -3,8 +3,16 @@
 """The setup script."""
 import os
 import re
+import warnings
 
 from setuptools import setup, find_packages
+from setuptools.command.build_ext import build_ext
+
+try:
+    from setuptools.errors import CCompilerError, ExecError, PlatformError
+except ImportError:  # setuptools < 59
+    from distutils.errors import CCompilerError, DistutilsExecError as ExecError, \
+        DistutilsPlatformError as PlatformError
 
 
 def get_version():
@@ -25,6 +33,55 @@ setup_requirements = ['pytest-runner', ]
 
 test_requirements = ['pytest>=3', ]
 
+
+def get_ext_modules():
+    """
+    Optionally compile the parser and lexer with Cython when PEEK_CYTHON is set.
+    Falls back to the pure Python modules if Cython is not available.
+    """
+    if not os.environ.get('PEEK_CYTHON'):
+        return []
+    try:
+        from Cython.Build import cythonize
+    except ImportError:
+        warnings.warn('PEEK_CYTHON is set but Cython is not installed, skipping compilation')
+        return []
+    return cythonize(['peek/parser.py', 'peek/lexers.py'], language_level=3)
+
+
+class OptionalBuildExt(build_ext):
+    """
+    Build the optional extensions and fall back to the pure Python modules when there
+    is no working C compiler
+    """
+
+    def initialize_options(self):
+        super().initialize_options()
+        self._failed_extensions = set()
+
+    def run(self):
+        try:
+            super().run()
+        except PlatformError as e:
+            warnings.warn(f'Cannot build extensions, falling back to pure Python modules: {e}')
+
+    def build_extension(self, ext):
+        try:
+            super().build_extension(ext)
+        except (CCompilerError, ExecError, PlatformError) as e:
+            self._failed_extensions.add(ext.name)
+            warnings.warn(f'Cannot build extension {ext.name}, falling back to pure Python module: {e}')
+
+    def copy_extensions_to_source(self):
+        # In-place builds (e.g. pip install -e) would otherwise fail on copying outputs that were never built
+        extensions = self.extensions
+        self.extensions = [ext for ext in extensions if ext.name not in self._failed_extensions]
+        try:
+            super().copy_extensions_to_source()
+        finally:
+            self.extensions = extensions
+
+
 setup(
     author="Yang Wang",
     author_email='ywangd@gmail.com',
@@ -52,9 +109,11 @@ setup(
     keywords='peek,elasticsearch,cli',
     name='es-peek',
     packages=find_packages(include=['peek', 'peek.*']),
+    ext_modules=get_ext_modules(),
+    cmdclass={'build_ext': OptionalBuildExt},
     setup_requires=setup_requirements,
     extras_require={
-        'full': ['kerberos~=1.3.0', 'pyperclip~=1.8.0']
+        'full': ['kerberos~=1.3.0', 'pyperclip~=1.8.0', 'orjson~=3.4']
     },
     test_suite='tests',
     tests_require=test_requirements,
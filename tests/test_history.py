@@ -0,0 +1,33 @@
+from unittest.mock import patch
+
+import pytest
+
+from peek.history import SqLiteHistory
+
+
+@pytest.fixture
+def config_dir(tmp_path):
+    with patch('peek.history.config_location', return_value=f'{tmp_path}/'):
+        yield tmp_path
+
+
+def test_history_is_trimmed_to_the_latest_entries(config_dir):
+    history = SqLiteHistory(history_max=5)
+    for i in range(12):
+        history.store_string(f'GET /{i}')
+    history.conn.close()
+
+    history = SqLiteHistory(history_max=5)
+    assert list(history.load_history_strings()) == [f'GET /{i}' for i in range(11, 6, -1)]
+    history.conn.close()
+
+
+def test_history_is_not_trimmed_below_max(config_dir):
+    history = SqLiteHistory(history_max=5)
+    for i in range(5):
+        history.store_string(f'GET /{i}')
+    history.conn.close()
+
+    history = SqLiteHistory(history_max=5)
+    assert list(history.load_history_strings()) == [f'GET /{i}' for i in range(4, -1, -1)]
+    history.conn.close()
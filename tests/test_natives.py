@@ -1,3 +1,4 @@
+import copy
 import json
 import os
 from unittest.mock import MagicMock, patch
@@ -5,8 +6,8 @@ from unittest.mock import MagicMock, patch
 import pytest
 from configobj import ConfigObj
 
-from peek.connection import ConnectFunc
-from peek.natives import ConnectionFunc, SessionFunc
+from peek.connection import ConnectFunc, EsClient
+from peek.natives import ConnectionFunc, SessionFunc, LazyFunc
 from peek.peekapp import PeekApp
 
 mock_history = MagicMock()
@@ -117,7 +118,7 @@ def test_connect_with_failed_test_will_not_be_added(peek_app):
 
     mock_es.transport.perform_request = MagicMock(side_effect=mock_perform_request)
     MockEs = MagicMock(return_value=mock_es)
-    with patch('peek.connection.Elasticsearch', MockEs):
+    with patch('elasticsearch.Elasticsearch', MockEs), patch.dict(EsClient._transport_cache, clear=True):
         connect_f = ConnectFunc()
         assert connect_f(peek_app, username=None, test=True) is None
         peek_app.display.error.assert_called_with(error)
@@ -173,3 +174,22 @@ def test_randint(peek_app):
 
     peek_app.process_input('let fiz = randint()')
     assert 0 <= peek_app.vm.get_value('bar') < 100
+
+
+def test_lazy_func(peek_app):
+    help_f = peek_app.vm.functions['help']
+    saml_f = peek_app.vm.functions['saml_authenticate']
+    assert isinstance(saml_f, LazyFunc)
+
+    assert help_f(peek_app, saml_f) == "saml_authenticate - Start SAML authentication flow\n" \
+                                       "{'realm': 'saml1', 'callback_port': '5601', 'name': None, 'conn': None}"
+
+
+def test_lazy_func_private_names_do_not_load():
+    f = LazyFunc('peek.saml:SamlAuthenticateFunc')
+    assert not hasattr(f, '__setstate__')
+    assert f._func is None
+
+    copied = copy.copy(f)
+    assert copied._spec == 'peek.saml:SamlAuthenticateFunc'
+    assert copied._func is None
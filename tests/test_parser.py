@@ -1,3 +1,5 @@
+from unittest.mock import patch
+
 import pytest
 from pygments.token import String, Whitespace, Comment, Literal, Name
 
@@ -244,6 +246,17 @@ def test_parser_bulk_index(parser):
 '''
 
 
+def test_parser_dict_keys_are_shared(parser):
+    text = '''PUT _bulk
+{"index": {"_index": "test"}}
+{"index": {"_index": "test"}}
+'''
+    n = parser.parse(text)[0]
+    first_key, second_key = [d.kv_nodes[0].key_node.token.value for d in n.dict_nodes]
+    assert first_key == '"index"'
+    assert first_key is second_key
+
+
 def test_parser_invalid_missing_comma(parser):
     text = """get abc
 {"a": 1 2,
@@ -415,3 +428,41 @@ def test_allow_error_token(parser):
     with pytest.raises(PeekSyntaxError):
         parser.parse(text, fail_fast_on_error_token=False)
     assert len(events) > 0
+
+
+def test_parser_reuses_tokens_of_same_text(parser):
+    text = '''get abc
+{"a": 1}
+'''
+    with patch.object(parser.lexer, 'get_tokens_unprocessed', wraps=parser.lexer.get_tokens_unprocessed) as lex:
+        first = parser.parse(text)
+        second = parser.parse(text)
+        parser.parse(text, payload_only=False, last_stmt_only=True)
+
+    assert lex.call_count == 1
+    assert str(first) == str(second)
+    assert first[0] is not second[0]
+
+
+def test_parser_tokens_cache_is_bounded_by_text_length(parser):
+    texts = [f'f {i} "{"x" * 15000}"' for i in range(30)]
+    for text in texts:
+        parser.parse(text)
+
+    assert parser._tokens_cache_chars <= 128 * 1024
+    assert parser._tokens_cache_chars == sum(len(text) for text, _ in parser._tokens_cache)
+    assert (texts[-1], ('root',)) in parser._tokens_cache
+    assert (texts[0], ('root',)) not in parser._tokens_cache
+
+
+def test_parser_without_tokens_cache():
+    parser = PeekParser(cache_tokens=False)
+    with patch.object(parser.lexer, 'get_tokens_unprocessed', wraps=parser.lexer.get_tokens_unprocessed) as lex:
+        parser.parse('get abc')
+        parser.parse('get abc')
+
+    assert lex.call_count == 2
+
+
+def test_parsers_share_lexer():
+    assert PeekParser().lexer is PeekParser().lexer
@@ -1,4 +1,5 @@
 import os
+import sys
 from unittest.mock import MagicMock, call
 
 import pytest
@@ -124,30 +125,37 @@ def test_payload_file(peek_vm, parser):
     peek_vm.app.es_client_manager.current.perform_request.assert_called_with(
         'PUT',
         '/_bulk',
-        '{"index": {"_index": "index", "_id": "1"}}\n'
-        '{"category": "click", "tag": 1}\n'
-        '{"index": {"_index": "index", "_id": "2"}}\n'
-        '{"category": "click", "tag": 2}\n'
-        '{"index": {"_index": "index", "_id": "3"}}\n'
-        '{"category": "click", "tag": 3}\n'
-        '{"index": {"_index": "index", "_id": "4"}}\n'
-        '{"category": "click", "tag": 4}\n'
-        '{"index": {"_index": "index", "_id": "5"}}\n'
-        '{"category": "click", "tag": 5}\n'
-        '{"index": {"_index": "index", "_id": "6"}}\n'
-        '{"category": "click", "tag": 6}\n'
-        '{"index": {"_index": "index", "_id": "7"}}\n'
-        '{"category": "click", "tag": 7}\n'
-        '{"index": {"_index": "index", "_id": "8"}}\n'
-        '{"category": "click", "tag": 8}\n'
-        '{"index": {"_index": "index", "_id": "9"}}\n'
-        '{"category": "click", "tag": 9}\n'
-        '{"index": {"_index": "index", "_id": "10"}}\n'
-        '{"category": "click", "tag": 10}\n',
+        b'{"index":{"_index":"index","_id":"1"}}\n'
+        b'{"category":"click","tag":1}\n'
+        b'{"index":{"_index":"index","_id":"2"}}\n'
+        b'{"category":"click","tag":2}\n'
+        b'{"index":{"_index":"index","_id":"3"}}\n'
+        b'{"category":"click","tag":3}\n'
+        b'{"index":{"_index":"index","_id":"4"}}\n'
+        b'{"category":"click","tag":4}\n'
+        b'{"index":{"_index":"index","_id":"5"}}\n'
+        b'{"category":"click","tag":5}\n'
+        b'{"index":{"_index":"index","_id":"6"}}\n'
+        b'{"category":"click","tag":6}\n'
+        b'{"index":{"_index":"index","_id":"7"}}\n'
+        b'{"category":"click","tag":7}\n'
+        b'{"index":{"_index":"index","_id":"8"}}\n'
+        b'{"category":"click","tag":8}\n'
+        b'{"index":{"_index":"index","_id":"9"}}\n'
+        b'{"category":"click","tag":9}\n'
+        b'{"index":{"_index":"index","_id":"10"}}\n'
+        b'{"category":"click","tag":10}\n',
         headers=None,
     )
 
 
+def test_payload_with_integer_beyond_64_bits(peek_vm, parser):
+    peek_vm.execute_node(parser.parse('''PUT /i/_doc/1
+{"n": 123456789012345678901234567890}''')[0])
+    peek_vm.app.es_client_manager.current.perform_request.assert_called_with(
+        'PUT', '/i/_doc/1', b'{"n":123456789012345678901234567890}\n', headers=None)
+
+
 def test_warning_header(peek_vm, parser):
     import elasticsearch
     if elasticsearch.__version__ < (7, 7, 0):
@@ -168,3 +176,69 @@ def test_warning_header(peek_vm, parser):
 
     peek_vm.execute_node(parser.parse('GET /')[0])
     peek_vm.app.display.warn.assert_called_with(message)
+
+
+def test_null_variable(peek_vm, parser):
+    peek_vm.execute_node(parser.parse('let x = null')[0])
+    peek_vm.execute_node(parser.parse('debug x')[0])
+    assert_called_with(peek_vm, None)
+
+    with pytest.raises(NameError):
+        peek_vm.get_value('no_such_name')
+
+
+def test_string_and_number_literals(peek_vm, parser):
+    peek_vm.execute_node(parser.parse(r'''debug -3 "a\"b" 'c\nd' """e"f""" "" 0x1f 1.5e3 2j''')[0])
+    assert_called_with(peek_vm, -3, 'a"b', 'c\nd', 'e"f', '', 31, 1500.0, 2j)
+
+
+def test_string_escapes(peek_vm, parser):
+    peek_vm.execute_node(parser.parse(r'''debug "a\\b\tc" 'd\'e' "é\x41" """f\"\"\"g""" "h\u00e9"''')[0])
+    assert_called_with(peek_vm, 'a\\b\tc', "d'e", 'éA', 'f"""g', 'hé')
+
+
+def test_long_string_literals_are_not_cached(peek_vm, parser):
+    from peek.vm import _eval_cached_string_literal
+    long_value = 'x' * 1000
+    cache_size = _eval_cached_string_literal.cache_info().currsize
+    peek_vm.execute_node(parser.parse(f'debug "{long_value}" \'{long_value}\\n\'')[0])
+    assert_called_with(peek_vm, long_value, long_value + '\n')
+    assert _eval_cached_string_literal.cache_info().currsize == cache_size
+
+
+def test_evaluate_nested_data(peek_vm, parser):
+    peek_vm.execute_node(parser.parse('let x = 42')[0])
+    node = parser.parse('debug {x: [1, {"a": [x, "b"]}, []], "c": {}}')[0].args_node.value_nodes[0]
+    assert peek_vm.evaluate(node) == {42: [1, {'a': [42, 'b']}, []], 'c': {}}
+    assert peek_vm.evaluate(node, resolve_key_name=False) == {'x': [1, {'a': [42, 'b']}, []], 'c': {}}
+
+
+def test_evaluate_fails_when_delegated_node_produces_no_value(peek_vm, parser):
+    node = parser.parse('debug [1, x] {"a": x}')[0].args_node
+    array_node, dict_node = node.value_nodes
+    array_node.value_nodes[1] = MagicMock(name='NoValueNode')
+    dict_node.kv_nodes[0].value_node = MagicMock(name='NoValueNode')
+    with pytest.raises(AssertionError):
+        peek_vm.evaluate(array_node)
+    with pytest.raises(AssertionError):
+        peek_vm.evaluate(dict_node)
+    with pytest.raises(AssertionError):
+        peek_vm.evaluate(MagicMock(name='NoValueNode'))
+
+
+def test_load_extensions_from_directory(tmp_path):
+    (tmp_path / 'peek_test_ext.py').write_text('EXPORTS = {"ext_answer": 42}\n')
+    (tmp_path / 'not_a_module.py').mkdir()
+    (tmp_path / 'README.txt').write_text('EXPORTS = {"ignored": 1}\n')
+
+    mock_app = MagicMock(name='PeekApp')
+    mock_app.config = ConfigObj({'load_extension': 'True', 'extension_path': str(tmp_path)})
+    sys_path = sys.path[:]
+    try:
+        vm = PeekVM(mock_app)
+    finally:
+        sys.modules.pop('peek_test_ext', None)
+
+    assert vm.get_value('ext_answer') == 42
+    assert 'ignored' not in vm.context
+    assert sys.path == sys_path